@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+SCENARIO SWEEP - Evaluate YourBuyerAgent across many (product, budget) scenarios
+Run: python eval/driver.py [num_scenarios]
+"""
+
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from kernels import buyer, _decide_batch
+
+GRADES = np.array(list(buyer._GRADE_ADJ) + ["C"])  # "C" has no adjustment
+
+# ============================================
+# VECTORIZED PRICING
+# ============================================
+
+def fair_prices(base_prices: np.ndarray, grades: np.ndarray, export_flags: np.ndarray) -> np.ndarray:
+    """Array form of calculate_fair_price, one pass over every scenario."""
+    base = np.asarray(base_prices, dtype=np.int64)
+    grades = np.asarray(grades)
+    mult = np.ones(base.shape)
+    for grade, adj in buyer._GRADE_ADJ.items():
+        mult = np.where(grades == grade, adj, mult)
+    mult = mult + 0.02 * np.asarray(export_flags, dtype=bool)
+    return np.clip((base * mult).astype(int), (base * 0.7).astype(int), (base * 1.2).astype(int))
+
+def summarize(final_prices: np.ndarray, budgets: np.ndarray, base_prices: np.ndarray, fair: np.ndarray) -> Dict[str, np.ndarray]:
+    """Savings and market percentages of summarize_negotiation, for all scenarios at once."""
+    savings = budgets - final_prices
+    below_market = base_prices - final_prices
+    return {
+        "buyer_savings": savings,
+        "buyer_savings_pct": savings / budgets * 100,
+        "below_market": below_market,
+        "below_market_pct": below_market / base_prices * 100,
+        "buyer_won": final_prices < fair,
+    }
+
+# ============================================
+# SCENARIO CONSTRUCTION
+# ============================================
+
+def build_contexts(
+    base_prices: np.ndarray,
+    grades: np.ndarray,
+    export_flags: np.ndarray,
+    budgets: np.ndarray,
+    name: str = "Alphonso Mangoes",
+    quantity: int = 10
+) -> List["buyer.NegotiationContext"]:
+    return [
+        buyer.NegotiationContext(
+            product=buyer.Product(
+                name=name,
+                category="Fruit",
+                origin="India",
+                quantity=quantity,
+                base_market_price=int(base),
+                quality_grade=str(grade),
+                attributes={"export_grade": bool(export)}
+            ),
+            your_budget=int(budget),
+            current_round=0,
+            seller_offers=[],
+            your_offers=[],
+            message_roles=[],
+            message_texts=[]
+        )
+        for base, grade, export, budget in zip(base_prices, grades, export_flags, budgets)
+    ]
+
+def seller_trajectories(base_prices: np.ndarray, rounds: int = buyer.MAX_ROUNDS) -> np.ndarray:
+    # Scripted seller: opens 30% above market and concedes 3% of market per round
+    steps = 1.30 - 0.03 * np.arange(rounds)
+    return (np.asarray(base_prices)[:, None] * steps).astype(int)
+
+# ============================================
+# MONTE-CARLO POLICY SWEEP
+# ============================================
+
+def simulate_policy(fair: np.ndarray, budgets: np.ndarray, trajectories: np.ndarray) -> np.ndarray:
+    """
+    Play every seller trajectory against the buyer's decision rule, one
+    compiled kernel call per round. Turns the agent would send to the LLM
+    settle at its fallback (the last offer within bounds). Returns the
+    agreed price per scenario, or -1 where no deal was reached.
+    """
+    fair = fair.astype(np.int32)
+    max_willings = budgets.astype(np.int32)
+    min_willings = np.maximum(1, (fair * 0.6).astype(np.int32))
+    last_offers = (fair * 0.75).astype(np.int32)
+    agreed = np.full(len(fair), -1, dtype=np.int32)
+
+    for current_round, seller_prices in enumerate(trajectories.astype(np.int32).T, 1):
+        open_ = agreed < 0
+        if not open_.any():
+            break
+        outcomes, prices = _decide_batch(
+            current_round, seller_prices[open_], fair[open_], last_offers[open_], max_willings[open_], min_willings[open_]
+        )
+        idx = np.flatnonzero(open_)
+        accepted = outcomes == buyer.TURN_ACCEPT
+        agreed[idx[accepted]] = prices[accepted]
+        last_offers[idx[~accepted]] = prices[~accepted]
+    return agreed
+
+# ============================================
+# MAIN
+# ============================================
+
+def main(num_scenarios: int = 24, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    base_prices = rng.integers(300, 900, size=num_scenarios)
+    grades = rng.choice(GRADES, size=num_scenarios)
+    export_flags = rng.random(num_scenarios) < 0.5
+    budgets = (base_prices * rng.uniform(0.8, 1.1, size=num_scenarios)).astype(int)
+
+    fair = fair_prices(base_prices, grades, export_flags)
+    contexts = build_contexts(base_prices, grades, export_flags, budgets)
+    trajectories = seller_trajectories(base_prices)
+
+    agreed = simulate_policy(fair, budgets, trajectories)
+    print(f"Deterministic policy: {(agreed >= 0).mean() * 100:.1f}% deals, mean price ₹{agreed[agreed >= 0].mean():.1f}")
+
+    results = buyer.run_batched([(context, prices.tolist()) for context, prices in zip(contexts, trajectories)])
+    final_prices = np.array([price for _, price in results])
+    deals = np.array([status == buyer.DealStatus.ACCEPTED for status, _ in results])
+
+    stats = summarize(final_prices, budgets, base_prices, fair)
+    print(f"Scenarios: {num_scenarios}, Deals: {deals.sum()}")
+    print(f"Mean Buyer Savings: ₹{stats['buyer_savings'].mean():.1f} ({stats['buyer_savings_pct'].mean():.1f}%)")
+    print(f"Mean Below Market: ₹{stats['below_market'].mean():.1f} ({stats['below_market_pct'].mean():.1f}%)")
+    print(f"Buyer won (below fair value): {stats['buyer_won'].mean() * 100:.1f}%")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 24)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+DECISION KERNELS - Numba-compiled buyer decision rule for bulk sweeps
+The interactive agents keep the Python path; these only serve eval/driver.py.
+"""
+
+import os
+import importlib.util
+
+import numpy as np
+from numba import njit, prange
+
+# The buyer agent lives in a file whose name is not importable, so load it by path
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location("buyer_agent", os.path.join(_ROOT, "interview_negotiation_template Revised.py"))
+buyer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(buyer)
+
+# The agent's own rule, compiled as-is so the sweep cannot drift from it.
+# Not cached: numba's cache only tracks this file, so edits to the agent
+# would be missed.
+_decide = njit(buyer._decide_turn)
+
+@njit(parallel=True)
+def _decide_batch(current_round, seller_prices, fair_prices, last_offers, max_willings, min_willings):
+    n = seller_prices.shape[0]
+    outcomes = np.empty(n, dtype=np.int32)
+    prices = np.empty(n, dtype=np.int32)
+    for i in prange(n):
+        outcome, price = _decide(current_round, seller_prices[i], fair_prices[i], last_offers[i], max_willings[i], min_willings[i])
+        outcomes[i] = outcome
+        prices[i] = price
+    return outcomes, prices
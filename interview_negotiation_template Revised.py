@@ -5,15 +5,192 @@ Save as negotiation_agent_manoj_ollama_summary.py and run with: python negotiati
 """
 
 import sys
+import os
 import re
-from typing import Dict, List, Tuple, Any
+import asyncio
+import atexit
+import threading
+import functools
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 from abc import ABC, abstractmethod
-import subprocess
+import httpx
 
 OLLAMA_MODEL = "llama3.1:8b"  # ensure installed locally
+OLLAMA_URL = "http://localhost:11434"  # local Ollama server (`ollama serve`)
+OLLAMA_KEEP_ALIVE = "30m"  # keep the model loaded for the whole session
+# Replies are 1-2 sentences, so cap decoding instead of running to the server default
+OLLAMA_OPTIONS = {"num_predict": 48, "temperature": 0.4, "top_p": 0.9, "stop": ["\n\n"]}
 MAX_ROUNDS = 10  # max negotiation rounds
+BATCH_SIZE = 6  # turns per batched prompt; gains flatten out past ~6 samples
+_REPLY_RE = re.compile(r"### REPLY (\d+) ###")  # splits a batched generation into numbered replies
+
+# Price parsing: drop thousands separators and the rupee sign, take the first
+# integer (prices are whole rupees; any paise would be truncated anyway)
+_PRICE_RE = re.compile(r"\d+")
+# One C-level pass instead of chained .replace(); whitespace is kept so that
+# separate numbers ("450 500") are not glued together
+_STRIP_TBL = str.maketrans("", "", ",₹")
+_SENTENCE_END_RE = re.compile(r"[.!?]\s")
+
+# One keep-alive HTTP client for the whole session, so each turn reuses the
+# connection (unless its stream was cut short, see _stream_reply) and the
+# server keeps the model loaded instead of re-spawning the `ollama` CLI. Server-side tuning (set before `ollama serve`):
+#   OLLAMA_KEEP_ALIVE=30m   keep llama3.1:8b resident between requests
+#   OLLAMA_NUM_PARALLEL=4   number of requests served concurrently
+_SESSION = httpx.Client(base_url=OLLAMA_URL, timeout=60)
+atexit.register(_SESSION.close)
+_ASYNC_SESSION: Optional[httpx.AsyncClient] = None
+
+
+def _async_session() -> httpx.AsyncClient:
+    """Lazily open the shared async client inside the running event loop."""
+    global _ASYNC_SESSION
+    if _ASYNC_SESSION is None:
+        _ASYNC_SESSION = httpx.AsyncClient(base_url=OLLAMA_URL, timeout=60)
+    return _ASYNC_SESSION
+
+
+async def _close_async_session():
+    global _ASYNC_SESSION
+    if _ASYNC_SESSION is not None:
+        await _ASYNC_SESSION.aclose()
+        _ASYNC_SESSION = None
+
+# LLM replies keyed by a digest of the request; seeded sweeps and re-runs hit often
+CACHE_SIZE = 1024
+# The caches are shared by every agent, so threads sharing one agent must not
+# interleave a lookup with another thread's eviction
+_CACHE_LOCK = threading.Lock()
+_RESPONSE_CACHE: "OrderedDict[str, str]" = OrderedDict()
+# Buyer counters keyed by the product, exact budget and bucketed (₹10) prices they answered
+_TURN_CACHE: "OrderedDict[Tuple[Any, ...], int]" = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key: Any) -> Any:
+    with _CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key: Any, value: Any):
+    with _CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _payload_key(payload: Dict[str, Any]) -> str:
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _base_payload(samples: int = 1) -> Dict[str, Any]:
+    # keep_alive is sent per request so the model stays resident for the
+    # session even when the server was started without OLLAMA_KEEP_ALIVE
+    options = dict(OLLAMA_OPTIONS)
+    if samples > 1:
+        # Room for every reply; blank lines between replies are expected
+        options["num_predict"] *= samples
+        options.pop("stop")
+    return {"model": OLLAMA_MODEL, "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE, "options": options}
+
+
+def _chat_payload(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    return {**_base_payload(), "messages": messages}
+
+
+def _generate_payload(prompt: str, samples: int = 1) -> Dict[str, Any]:
+    return {**_base_payload(samples), "prompt": prompt}
+
+
+def _price_sentence_end(text: str) -> Optional[int]:
+    # End of the sentence naming the first price, once it has streamed in
+    match = _PRICE_RE.search(text)
+    if match is None:
+        return None
+    end = _SENTENCE_END_RE.search(text, match.end())
+    return end.start() + 1 if end else None
+
+
+def _chunk_text(chunk: Dict[str, Any]) -> str:
+    # /api/chat streams message.content, /api/generate streams response
+    if "message" in chunk:
+        return chunk["message"].get("content", "")
+    return chunk.get("response", "")
+
+
+def _stream_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    """
+    Stream a reply, and with early_exit stop reading (closing the stream
+    aborts generation server-side) once the sentence naming a price ends.
+    Closing an unfinished response also drops its connection, so the next
+    request reconnects; on a local server that handshake is far cheaper
+    than draining the rest of the generation, which is the time saved.
+    """
+    reply = ""
+    with _SESSION.stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            reply += _chunk_text(chunk)
+            if chunk.get("done"):
+                break
+            cut = _price_sentence_end(reply) if early_exit else None
+            if cut is not None:
+                reply = reply[:cut]
+                break
+    return reply.strip()
+
+
+async def _astream_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    # Same early exit as _stream_reply, at the same cost of a reconnect
+    reply = ""
+    async with _async_session().stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            reply += _chunk_text(chunk)
+            if chunk.get("done"):
+                break
+            cut = _price_sentence_end(reply) if early_exit else None
+            if cut is not None:
+                reply = reply[:cut]
+                break
+    return reply.strip()
+
+
+def _cached_reply(path: str, payload: Dict[str, Any], early_exit: bool = True, keep: Callable[[str], bool] = bool) -> str:
+    # Only replies passing keep (by default: non-empty) are stored, so a bad
+    # generation is retried next time instead of replayed
+    key = _payload_key(payload)
+    response = _cache_get(_RESPONSE_CACHE, key)
+    if response is None:
+        response = _stream_reply(path, payload, early_exit)
+        if keep(response):
+            _cache_put(_RESPONSE_CACHE, key, response)
+    return response
+
+
+async def _acached_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    key = _payload_key(payload)
+    response = _cache_get(_RESPONSE_CACHE, key)
+    if response is None:
+        response = await _astream_reply(path, payload, early_exit)
+        if response:
+            _cache_put(_RESPONSE_CACHE, key, response)
+    return response
 
 # ============================================
 # DATA STRUCTURES
@@ -36,13 +213,71 @@ class NegotiationContext:
     current_round: int
     seller_offers: List[int]
     your_offers: List[int]
-    messages: List[Dict[str, str]]
+    message_roles: List[int]  # BUYER or SELLER, parallel to message_texts
+    message_texts: List[str]
+
+# Message roles
+BUYER = 0
+SELLER = 1
+_CHAT_ROLES = ("assistant", "user")  # the agent is the buyer; the seller is the chat user
 
 class DealStatus(Enum):
     ONGOING = "ongoing"
     ACCEPTED = "accepted"
     REJECTED = "rejected"
 
+# ============================================
+# FAIR PRICE
+# ============================================
+
+_GRADE_ADJ = {"A": 1.05, "B": 0.95, "Export": 1.10}  # quality grade -> price multiplier
+
+@functools.lru_cache(maxsize=256)
+def _fair_price(base: int, grade: str, export: bool) -> int:
+    # Pure in its inputs, which stay fixed for a whole negotiation
+    multiplier = _GRADE_ADJ.get(grade, 1.0)
+    if export:
+        multiplier += 0.02
+    fair = int(base * multiplier)
+    fair = max(int(base * 0.7), min(int(base * 1.2), fair))
+    return fair
+
+# ============================================
+# DECISION RULE
+# ============================================
+
+# Outcomes of _decide_turn
+TURN_LLM = 0       # no scripted answer, ask the LLM
+TURN_ACCEPT = 1
+TURN_ASK_10 = 2    # round 9: ask for 10% off
+TURN_COUNTER = 3   # deterministic step towards the seller
+
+def _decide_turn(current_round: int, seller_price: int, fair_price: int, last_offer: int, max_willing: int, min_willing: int) -> Tuple[int, int]:
+    """
+    LLM-free part of the buyer's rule, as (outcome, price). For TURN_LLM the
+    price is what the turn settles at if the LLM is unavailable. Plain
+    arithmetic only, so eval/kernels.py can compile this same function.
+    """
+    if current_round == 9:
+        # Ask for 10% reduction
+        return TURN_ASK_10, max(min(int(seller_price * 0.9), max_willing), min_willing)
+
+    if current_round == 10:
+        # Accept regardless
+        return TURN_ACCEPT, seller_price
+
+    tolerance = int(fair_price * 0.02)
+    if seller_price <= max_willing and seller_price <= fair_price + tolerance:
+        return TURN_ACCEPT, seller_price
+
+    # Far outside the bounds the LLM's counter gets clamped anyway, so
+    # step towards the seller deterministically instead of asking it
+    if seller_price > max_willing * 1.2 or seller_price < min_willing:
+        step = (seller_price - last_offer) // 4
+        return TURN_COUNTER, min(max(last_offer + step, min_willing), max_willing)
+
+    return TURN_LLM, min(max(last_offer, min_willing), max_willing)
+
 # ============================================
 # BASE AGENT
 # ============================================
@@ -50,10 +285,20 @@ class DealStatus(Enum):
 class BaseBuyerAgent(ABC):
     def __init__(self, name: str):
         self.name = name
-        self.personality = self.define_personality()
 
+    @property
+    def personality(self) -> Dict[str, Any]:
+        return self.personality_of()
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def personality_of(cls) -> Dict[str, Any]:
+        # Built once per agent class and shared by all of its instances
+        return cls.define_personality()
+
+    @classmethod
     @abstractmethod
-    def define_personality(self) -> Dict[str, Any]:
+    def define_personality(cls) -> Dict[str, Any]:
         pass
 
     @abstractmethod
@@ -70,7 +315,8 @@ class BaseBuyerAgent(ABC):
 
 class YourBuyerAgent(BaseBuyerAgent):
 
-    def define_personality(self) -> Dict[str, Any]:
+    @classmethod
+    def define_personality(cls) -> Dict[str, Any]:
         return {
             "personality_type": "assertive_value_protector",
             "traits": ["confident", "persuasive", "value-conscious", "strategic"],
@@ -86,79 +332,212 @@ class YourBuyerAgent(BaseBuyerAgent):
         seller_price: int,
         seller_message: str
     ) -> Tuple[DealStatus, int, str]:
-        fair_price = self.calculate_fair_price(context.product)
+        fair_price, last_offer, max_willing, min_willing = self._negotiation_bounds(context)
+        scripted = self._scripted_response(context, seller_price, fair_price, last_offer, max_willing, min_willing)
+        if scripted:
+            return scripted
+
+        messages = self._build_messages(context, seller_price, seller_message, fair_price, last_offer, max_willing, min_willing)
+        ai_reply, from_llm = self.query_ollama(messages, fallback_price=last_offer)
+        return self._finalize_counter(context, seller_price, ai_reply, from_llm, fair_price, last_offer, max_willing, min_willing)
+
+    async def arespond_to_seller_offer(
+        self,
+        context: NegotiationContext,
+        seller_price: int,
+        seller_message: str
+    ) -> Tuple[DealStatus, int, str]:
+        """Same decision as respond_to_seller_offer, awaiting the LLM call."""
+        fair_price, last_offer, max_willing, min_willing = self._negotiation_bounds(context)
+        scripted = self._scripted_response(context, seller_price, fair_price, last_offer, max_willing, min_willing)
+        if scripted:
+            return scripted
+
+        messages = self._build_messages(context, seller_price, seller_message, fair_price, last_offer, max_willing, min_willing)
+        ai_reply, from_llm = await self.aquery_ollama(messages, fallback_price=last_offer)
+        return self._finalize_counter(context, seller_price, ai_reply, from_llm, fair_price, last_offer, max_willing, min_willing)
+
+    @classmethod
+    def _negotiation_bounds(cls, context: NegotiationContext) -> Tuple[int, int, int, int]:
+        fair_price = cls.calculate_fair_price(context.product)
         last_offer = context.your_offers[-1] if context.your_offers else int(fair_price * 0.75)
         max_willing = context.your_budget
         min_willing = max(1, int(fair_price * 0.6))
+        return fair_price, last_offer, max_willing, min_willing
 
-        # --- Round-specific logic ---
-        if context.current_round == 9:
-            # Ask for 10% reduction
-            target_price = int(seller_price * 0.9)
-            if target_price > max_willing:
-                target_price = max_willing
-            if target_price < min_willing:
-                target_price = min_willing
-            msg = f"If you can reduce by 10% to ₹{target_price}, we have a deal."
-            return DealStatus.ONGOING, target_price, msg
-
-        if context.current_round == 10:
-            # Accept regardless
-            return DealStatus.ACCEPTED, seller_price, f"Alright, I accept ₹{seller_price}."
-
-        # --- Normal negotiation logic ---
-        prompt = f"""
-You are a confident, value-protecting buyer negotiating for {context.product.quantity} x {context.product.name} (quality: {context.product.quality_grade}).
-Market price: ₹{context.product.base_market_price}, Fair price: ₹{fair_price}, Buyer budget: ₹{context.your_budget}.
-Seller offer: ₹{seller_price} — "{seller_message}".
-Your last offer: ₹{last_offer}.
-Your goal: Protect your budget, aim for best deal without going above ₹{max_willing}.
-Respond firmly with either 'ACCEPT' or a confident counteroffer (must not exceed ₹{max_willing}, and not go below ₹{min_willing}).
-Keep messages 1–2 sentences, persuasive, matching your final numeric offer exactly.
-"""
-        ai_reply = self.query_ollama(prompt, fallback_price=last_offer)
-        counter = self.extract_price(ai_reply)
-
+    @classmethod
+    def _scripted_response(
+        cls,
+        context: NegotiationContext,
+        seller_price: int,
+        fair_price: int,
+        last_offer: int,
+        max_willing: int,
+        min_willing: int
+    ) -> Optional[Tuple[DealStatus, int, str]]:
+        # Decided without the LLM, so don't pay for a generation
+        outcome, price = _decide_turn(context.current_round, seller_price, fair_price, last_offer, max_willing, min_willing)
+        if outcome == TURN_ASK_10:
+            return DealStatus.ONGOING, price, f"If you can reduce by 10% to ₹{price}, we have a deal."
+
+        if outcome == TURN_ACCEPT:
+            return DealStatus.ACCEPTED, price, f"Alright, I accept ₹{price}."
+
+        if outcome == TURN_COUNTER:
+            return DealStatus.ONGOING, price, cls._counter_message(context, price)
+
+        cached = _cache_get(_TURN_CACHE, cls._state_key(context, seller_price, fair_price, last_offer, max_willing))
+        if cached is not None:
+            # The key buckets prices, so never offer more than this seller asked
+            # and re-apply the bounds (bucketed fair prices can shift min_willing).
+            # The stored reply may quote another price, so the message is rebuilt.
+            counter = min(cached, seller_price)
+            counter, msg = cls._clamp_counter(counter, cls._counter_message(context, counter), max_willing, min_willing)
+            return DealStatus.ONGOING, counter, msg
+
+        return None
+
+    @staticmethod
+    def _state_key(context: NegotiationContext, seller_price: int, fair_price: int, last_offer: int, max_willing: int) -> Tuple[Any, ...]:
+        # The budget is a hard limit, so it is matched exactly rather than bucketed
+        product = context.product
+        return (
+            product.name, product.quality_grade, product.quantity, context.current_round,
+            seller_price // 10, fair_price // 10, max_willing, last_offer // 10
+        )
+
+    @classmethod
+    def _counter_message(cls, context: NegotiationContext, counter: int) -> str:
+        catchphrases = cls.personality_of()["catchphrases"]
+        return f"{catchphrases[context.current_round % len(catchphrases)]} I can offer ₹{counter}."
+
+    @staticmethod
+    def _clamp_counter(counter: int, ai_reply: str, max_willing: int, min_willing: int) -> Tuple[int, str]:
         if counter > max_willing:
             counter = max_willing
             ai_reply = f"Considering my budget and the value, I can only go up to ₹{counter}."
         elif counter < min_willing:
             counter = min_willing
             ai_reply = f"This is my best and final offer given the market reality — ₹{counter}."
+        return counter, ai_reply
+
+    @staticmethod
+    def _negotiation_brief(context: NegotiationContext, fair_price: int, max_willing: int, min_willing: int) -> str:
+        # Fixed for the whole negotiation, so it lives in the system message
+        return f"""You are negotiating for {context.product.quantity} x {context.product.name} (quality: {context.product.quality_grade}).
+Market price: ₹{context.product.base_market_price}, Fair price: ₹{fair_price}, Buyer budget: ₹{context.your_budget}.
+Your goal: Protect your budget, aim for best deal without going above ₹{max_willing}.
+Respond firmly with either 'ACCEPT' or a confident counteroffer (must not exceed ₹{max_willing}, and not go below ₹{min_willing}).
+Keep messages 1–2 sentences, persuasive, matching your final numeric offer exactly.
+"""
 
-        tolerance = int(fair_price * 0.02)
-        if seller_price <= max_willing and seller_price <= fair_price + tolerance:
-            return DealStatus.ACCEPTED, seller_price, f"Alright, I accept ₹{seller_price}."
+    @staticmethod
+    def _turn_prompt(seller_price: int, seller_message: str, last_offer: int) -> str:
+        return f"""Seller offer: ₹{seller_price} — "{seller_message}".
+Your last offer: ₹{last_offer}.
+"""
 
+    def _build_messages(
+        self,
+        context: NegotiationContext,
+        seller_price: int,
+        seller_message: str,
+        fair_price: int,
+        last_offer: int,
+        max_willing: int,
+        min_willing: int
+    ) -> List[Dict[str, str]]:
+        """
+        Chat history for /api/chat. The system message and the turns before
+        the previous offer are identical from round to round, so the server
+        reuses their KV cache. The previous offer was sent as a turn prompt
+        but is replayed as the raw seller message, so processing resumes there
+        and covers the last two turns.
+        """
+        system = f"{self.get_personality_prompt()}\n{self._negotiation_brief(context, fair_price, max_willing, min_willing)}"
+        messages = [{"role": "system", "content": system}]
+        roles, texts = context.message_roles, context.message_texts
+        if roles and roles[-1] == SELLER:
+            roles, texts = roles[:-1], texts[:-1]  # the offer being answered goes in the turn prompt
+        for role, text in zip(roles, texts):
+            messages.append({"role": _CHAT_ROLES[role], "content": text})
+        messages.append({"role": "user", "content": self._turn_prompt(seller_price, seller_message, last_offer)})
+        return messages
+
+    @classmethod
+    def _finalize_counter(
+        cls,
+        context: NegotiationContext,
+        seller_price: int,
+        ai_reply: str,
+        from_llm: bool,
+        fair_price: int,
+        last_offer: int,
+        max_willing: int,
+        min_willing: int
+    ) -> Tuple[DealStatus, int, str]:
+        counter, ai_reply = cls._clamp_counter(cls.extract_price(ai_reply), ai_reply, max_willing, min_willing)
+        if from_llm:
+            # A fallback is not the model's answer, so the next turn in this state asks again
+            _cache_put(_TURN_CACHE, cls._state_key(context, seller_price, fair_price, last_offer, max_willing), counter)
         return DealStatus.ONGOING, counter, ai_reply
 
-    def query_ollama(self, prompt: str, fallback_price: int) -> str:
+    def query_ollama(self, messages: List[Dict[str, str]], fallback_price: int) -> Tuple[str, bool]:
+        """Returns (reply, from_llm); from_llm is False for the canned fallback."""
+        try:
+            response = _cached_reply("/api/chat", _chat_payload(messages))
+        except Exception:
+            response = ""
+        return (response, True) if response else (f"I can offer ₹{fallback_price}.", False)
+
+    async def aquery_ollama(self, messages: List[Dict[str, str]], fallback_price: int) -> Tuple[str, bool]:
+        try:
+            response = await _acached_reply("/api/chat", _chat_payload(messages))
+        except Exception:
+            response = ""
+        return (response, True) if response else (f"I can offer ₹{fallback_price}.", False)
+
+    def query_ollama_batch(self, prompts: List[str], fallback_prices: List[int]) -> List[Tuple[str, bool]]:
+        """
+        Answer several independent turns with a single generation. The
+        personality and any prompt text shared by every sample (product,
+        budget) are sent once as a header, and each sample is answered under
+        its own "### REPLY i ###". Returns a (reply, from_llm) pair per sample,
+        as query_ollama does.
+        """
+        # A lone prompt is its own common prefix, which would leave its sample empty
+        shared = os.path.commonprefix(prompts) if len(prompts) > 1 else ""
+        shared = shared[:shared.rfind("\n") + 1]
+        batch_prompt = (
+            f"{self.get_personality_prompt()}\n{shared}"
+            f"Below are {len(prompts)} independent negotiation turns. Answer every sample separately, "
+            "starting each answer on its own line with \"### REPLY i ###\" where i is the sample number.\n"
+        )
+        batch_prompt += "".join(f"\n### SAMPLE {i} ###\n" + p[len(shared):] for i, p in enumerate(prompts, 1))
         try:
-            result = subprocess.run(
-                ["ollama", "run", OLLAMA_MODEL],
-                input=prompt.encode("utf-8"),
-                capture_output=True,
-                check=True
+            # Every sample needs its reply, so read the generation to the end
+            response = _cached_reply(
+                "/api/generate", _generate_payload(batch_prompt, len(prompts)), early_exit=False,
+                keep=lambda r: len(_REPLY_RE.findall(r)) == len(prompts)  # don't replay missing replies
             )
-            response = result.stdout.decode("utf-8").strip()
-            return response if response else f"I can offer ₹{fallback_price}."
+            parts = _REPLY_RE.split(response)
+            # Match by the header's number, so a skipped header only costs that sample
+            replies = {int(n): r.strip() for n, r in zip(parts[1::2], parts[2::2])}
         except Exception:
-            return f"I can offer ₹{fallback_price}."
-
-    def extract_price(self, text: str) -> int:
-        s = text.replace(",", "").replace("₹", "").strip()
-        match = re.search(r"(\d+(\.\d+)?)", s)
-        return int(float(match.group(1))) if match else 0
-
-    def calculate_fair_price(self, product: Product) -> int:
-        base = product.base_market_price
-        grade_adj = {"A": 1.05, "B": 0.95, "Export": 1.10}
-        multiplier = grade_adj.get(product.quality_grade, 1.0)
-        if product.attributes.get("export_grade"):
-            multiplier += 0.02
-        fair = int(base * multiplier)
-        fair = max(int(base * 0.7), min(int(base * 1.2), fair))
-        return fair
+            replies = {}
+        return [
+            (replies[i], True) if replies.get(i) else (f"I can offer ₹{fallback_price}.", False)
+            for i, fallback_price in enumerate(fallback_prices, 1)
+        ]
+
+    @staticmethod
+    def extract_price(text: str) -> int:
+        match = _PRICE_RE.search(text.translate(_STRIP_TBL))
+        return int(match.group()) if match else 0
+
+    @staticmethod
+    def calculate_fair_price(product: Product) -> int:
+        return _fair_price(product.base_market_price, product.quality_grade, bool(product.attributes.get("export_grade")))
 
     def get_personality_prompt(self) -> str:
         return "You are a confident, firm, value-protecting buyer. Persuasive but concise."
@@ -169,7 +548,7 @@ Keep messages 1–2 sentences, persuasive, matching your final numeric offer exa
 # ============================================
 
 def summarize_negotiation(context: NegotiationContext, final_price: int):
-    fair_price = YourBuyerAgent(name="Temp").calculate_fair_price(context.product)
+    fair_price = YourBuyerAgent.calculate_fair_price(context.product)
     print("\n=== NEGOTIATION SUMMARY ===")
     print(f"Product: {context.product.quantity} x {context.product.name} (quality: {context.product.quality_grade})")
     print(f"Buyer Budget: ₹{context.your_budget}")
@@ -192,9 +571,97 @@ def summarize_negotiation(context: NegotiationContext, final_price: int):
     print(f"Result: {winner}\n")
 
     print("=== Full Conversation ===")
-    for msg in context.messages:
-        role = "Buyer" if msg["role"]=="buyer" else "Seller"
-        print(f"{role}: {msg['message']}")
+    for role, text in zip(context.message_roles, context.message_texts):
+        print(("Buyer", "Seller")[role] + ": " + text)
+
+# ============================================
+# BATCH EVALUATION
+# ============================================
+
+# The agent keeps no per-negotiation state and the shared caches are locked,
+# so one instance serves every concurrent negotiation, tasks or threads
+_EVAL_AGENT = YourBuyerAgent(name="EvalBuyer")
+
+async def _negotiate(agent: YourBuyerAgent, context: NegotiationContext, seller_prices: List[int]) -> Tuple[DealStatus, int]:
+    for seller_price in seller_prices[:MAX_ROUNDS]:
+        seller_message = f"I can do ₹{seller_price}."
+        context.current_round += 1
+        context.seller_offers.append(seller_price)
+        context.message_roles.append(SELLER)
+        context.message_texts.append(seller_message)
+
+        status, ai_offer, ai_msg = await agent.arespond_to_seller_offer(context, seller_price, seller_message)
+        context.your_offers.append(ai_offer)
+        context.message_roles.append(BUYER)
+        context.message_texts.append(ai_msg)
+
+        if status == DealStatus.ACCEPTED:
+            return status, ai_offer
+    return DealStatus.REJECTED, context.your_offers[-1] if context.your_offers else 0
+
+def run_many(scenarios: List[Tuple[NegotiationContext, List[int]]]) -> List[Tuple[DealStatus, int]]:
+    """
+    Play independent negotiations concurrently, one task per scenario.
+    Each scenario is a (context, scripted seller prices) pair; returns the
+    final (status, price) of each. Start the server with OLLAMA_NUM_PARALLEL=N
+    so up to N requests are actually decoded in parallel.
+    """
+    async def _run():
+        try:
+            return await asyncio.gather(*(_negotiate(_EVAL_AGENT, context, prices) for context, prices in scenarios))
+        finally:
+            await _close_async_session()
+
+    return asyncio.run(_run())
+
+def run_batched(scenarios: List[Tuple[NegotiationContext, List[int]]], batch_size: int = BATCH_SIZE) -> List[Tuple[DealStatus, int]]:
+    """
+    Play scripted negotiations in lockstep, answering up to batch_size pending
+    buyer turns per Ollama call. Same scenarios and results as run_many; meant
+    for offline sweeps, not the interactive chat.
+    """
+    agent = _EVAL_AGENT
+    results: List[Optional[Tuple[DealStatus, int]]] = [None] * len(scenarios)
+
+    def record(i: int, status: DealStatus, ai_offer: int, ai_msg: str):
+        context = scenarios[i][0]
+        context.your_offers.append(ai_offer)
+        context.message_roles.append(BUYER)
+        context.message_texts.append(ai_msg)
+        if status == DealStatus.ACCEPTED:
+            results[i] = (status, ai_offer)
+
+    for round_index in range(MAX_ROUNDS):
+        pending = []
+        for i, (context, seller_prices) in enumerate(scenarios):
+            if results[i] is not None or round_index >= len(seller_prices):
+                continue
+            seller_price = seller_prices[round_index]
+            seller_message = f"I can do ₹{seller_price}."
+            context.current_round += 1
+            context.seller_offers.append(seller_price)
+            context.message_roles.append(SELLER)
+            context.message_texts.append(seller_message)
+
+            fair_price, last_offer, max_willing, min_willing = agent._negotiation_bounds(context)
+            scripted = agent._scripted_response(context, seller_price, fair_price, last_offer, max_willing, min_willing)
+            if scripted:
+                record(i, *scripted)
+                continue
+            prompt = agent._negotiation_brief(context, fair_price, max_willing, min_willing) + agent._turn_prompt(seller_price, seller_message, last_offer)
+            pending.append((i, seller_price, prompt, fair_price, last_offer, max_willing, min_willing))
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            replies = agent.query_ollama_batch([turn[2] for turn in chunk], [turn[4] for turn in chunk])
+            for (i, seller_price, _, fair_price, last_offer, max_willing, min_willing), (ai_reply, from_llm) in zip(chunk, replies):
+                context = scenarios[i][0]
+                record(i, *agent._finalize_counter(context, seller_price, ai_reply, from_llm, fair_price, last_offer, max_willing, min_willing))
+
+    return [
+        result if result is not None else (DealStatus.REJECTED, context.your_offers[-1] if context.your_offers else 0)
+        for result, (context, _) in zip(results, scenarios)
+    ]
 
 # ============================================
 # INTERACTIVE CHAT
@@ -223,7 +690,8 @@ def chat_with_llama():
         current_round=0,
         seller_offers=[],
         your_offers=[],
-        messages=[]
+        message_roles=[],
+        message_texts=[]
     )
 
     while context.current_round < MAX_ROUNDS:
@@ -232,17 +700,20 @@ def chat_with_llama():
             print("Exiting chat...")
             break
 
-        match = re.search(r"(\d+)", user_input.replace(",", ""))
-        seller_price = int(match.group(1)) if match else product.base_market_price
+        digits = user_input.translate(_STRIP_TBL)
+        match = _PRICE_RE.search(digits)
+        seller_price = int(match.group()) if match else product.base_market_price
         seller_message = user_input
 
         context.current_round += 1
         context.seller_offers.append(seller_price)
-        context.messages.append({"role": "seller", "message": seller_message})
+        context.message_roles.append(SELLER)
+        context.message_texts.append(seller_message)
 
         status, ai_offer, ai_msg = agent.respond_to_seller_offer(context, seller_price, seller_message)
         context.your_offers.append(ai_offer)
-        context.messages.append({"role": "buyer", "message": ai_msg})
+        context.message_roles.append(BUYER)
+        context.message_texts.append(ai_msg)
 
         print(f"AI Buyer: ₹{ai_offer} — {ai_msg}")
 
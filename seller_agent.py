@@ -11,14 +11,175 @@ except Exception:
     pass
 
 import re
-import subprocess
-from typing import Dict, List, Tuple, Any
+import asyncio
+import atexit
+import threading
+import functools
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 from abc import ABC, abstractmethod
+import httpx
 
 # Ollama model
 OLLAMA_MODEL = "llama3.1:8b"
+OLLAMA_URL = "http://localhost:11434"  # local Ollama server (`ollama serve`)
+OLLAMA_KEEP_ALIVE = "30m"  # keep the model loaded for the whole session
+# Replies are 1-2 sentences, so cap decoding instead of running to the server default
+OLLAMA_OPTIONS = {"num_predict": 48, "temperature": 0.4, "top_p": 0.9, "stop": ["\n\n"]}
+
+# Price parsing: drop thousands separators and the rupee sign, take the first
+# integer (prices are whole rupees; any paise would be truncated anyway)
+_PRICE_RE = re.compile(r"\d+")
+# One C-level pass instead of chained .replace(); whitespace is kept so that
+# separate numbers ("450 500") are not glued together
+_STRIP_TBL = str.maketrans("", "", ",₹")
+_SENTENCE_END_RE = re.compile(r"[.!?]\s")
+
+# One keep-alive HTTP client for the whole session, so each turn reuses the
+# connection (unless its stream was cut short, see _stream_reply) and the
+# server keeps the model loaded instead of re-spawning the `ollama` CLI. Server-side tuning (set before `ollama serve`):
+#   OLLAMA_KEEP_ALIVE=30m   keep llama3.1:8b resident between requests
+#   OLLAMA_NUM_PARALLEL=4   number of requests served concurrently
+_SESSION = httpx.Client(base_url=OLLAMA_URL, timeout=60)
+atexit.register(_SESSION.close)
+_ASYNC_SESSION: Optional[httpx.AsyncClient] = None
+
+
+def _async_session() -> httpx.AsyncClient:
+    """Lazily open the shared async client inside the running event loop."""
+    global _ASYNC_SESSION
+    if _ASYNC_SESSION is None:
+        _ASYNC_SESSION = httpx.AsyncClient(base_url=OLLAMA_URL, timeout=60)
+    return _ASYNC_SESSION
+
+
+async def _close_async_session():
+    global _ASYNC_SESSION
+    if _ASYNC_SESSION is not None:
+        await _ASYNC_SESSION.aclose()
+        _ASYNC_SESSION = None
+
+# LLM replies keyed by a digest of the request; seeded sweeps and re-runs hit often
+CACHE_SIZE = 1024
+# The caches are shared by every agent, so threads sharing one agent must not
+# interleave a lookup with another thread's eviction
+_CACHE_LOCK = threading.Lock()
+_RESPONSE_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key: Any) -> Any:
+    with _CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key: Any, value: Any):
+    with _CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _payload_key(payload: Dict[str, Any]) -> str:
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _base_payload() -> Dict[str, Any]:
+    # keep_alive is sent per request so the model stays resident for the
+    # session even when the server was started without OLLAMA_KEEP_ALIVE
+    return {"model": OLLAMA_MODEL, "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE, "options": OLLAMA_OPTIONS}
+
+
+def _chat_payload(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    return {**_base_payload(), "messages": messages}
+
+
+def _price_sentence_end(text: str) -> Optional[int]:
+    # End of the sentence naming the first price, once it has streamed in
+    match = _PRICE_RE.search(text)
+    if match is None:
+        return None
+    end = _SENTENCE_END_RE.search(text, match.end())
+    return end.start() + 1 if end else None
+
+
+def _chunk_text(chunk: Dict[str, Any]) -> str:
+    # /api/chat streams message.content, /api/generate streams response
+    if "message" in chunk:
+        return chunk["message"].get("content", "")
+    return chunk.get("response", "")
+
+
+def _stream_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    """
+    Stream a reply, and with early_exit stop reading (closing the stream
+    aborts generation server-side) once the sentence naming a price ends.
+    Closing an unfinished response also drops its connection, so the next
+    request reconnects; on a local server that handshake is far cheaper
+    than draining the rest of the generation, which is the time saved.
+    """
+    reply = ""
+    with _SESSION.stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            reply += _chunk_text(chunk)
+            if chunk.get("done"):
+                break
+            cut = _price_sentence_end(reply) if early_exit else None
+            if cut is not None:
+                reply = reply[:cut]
+                break
+    return reply.strip()
+
+
+async def _astream_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    # Same early exit as _stream_reply, at the same cost of a reconnect
+    reply = ""
+    async with _async_session().stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            reply += _chunk_text(chunk)
+            if chunk.get("done"):
+                break
+            cut = _price_sentence_end(reply) if early_exit else None
+            if cut is not None:
+                reply = reply[:cut]
+                break
+    return reply.strip()
+
+
+def _cached_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    key = _payload_key(payload)
+    response = _cache_get(_RESPONSE_CACHE, key)
+    if response is None:
+        response = _stream_reply(path, payload, early_exit)
+        if response:  # an empty generation is retried next time, not replayed
+            _cache_put(_RESPONSE_CACHE, key, response)
+    return response
+
+
+async def _acached_reply(path: str, payload: Dict[str, Any], early_exit: bool = True) -> str:
+    key = _payload_key(payload)
+    response = _cache_get(_RESPONSE_CACHE, key)
+    if response is None:
+        response = await _astream_reply(path, payload, early_exit)
+        if response:
+            _cache_put(_RESPONSE_CACHE, key, response)
+    return response
 
 # ============================================
 # DATA STRUCTURES
@@ -41,13 +202,35 @@ class NegotiationContext:
     current_round: int
     buyer_offers: List[int]
     seller_offers: List[int]
-    messages: List[Dict[str, str]]
+    message_roles: List[int]  # BUYER or SELLER, parallel to message_texts
+    message_texts: List[str]
+
+# Message roles
+BUYER = 0
+SELLER = 1
+_CHAT_ROLES = ("user", "assistant")  # the agent is the seller; the buyer is the chat user
 
 class DealStatus(Enum):
     ONGOING = "ongoing"
     ACCEPTED = "accepted"
     REJECTED = "rejected"
 
+# ============================================
+# FAIR PRICE
+# ============================================
+
+_GRADE_ADJ = {"A": 1.05, "B": 0.95, "Export": 1.10}  # quality grade -> price multiplier
+
+@functools.lru_cache(maxsize=256)
+def _fair_price(base: int, grade: str, export: bool) -> int:
+    # Pure in its inputs, which stay fixed for a whole negotiation
+    multiplier = _GRADE_ADJ.get(grade, 1.0)
+    if export:
+        multiplier += 0.02
+    fair = int(base * multiplier)
+    # Always at least ₹1 above market price
+    return max(fair, base + 1)
+
 # ============================================
 # BASE AGENT
 # ============================================
@@ -55,10 +238,20 @@ class DealStatus(Enum):
 class BaseSellerAgent(ABC):
     def __init__(self, name: str):
         self.name = name
-        self.personality = self.define_personality()
 
+    @property
+    def personality(self) -> Dict[str, Any]:
+        return self.personality_of()
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def personality_of(cls) -> Dict[str, Any]:
+        # Built once per agent class and shared by all of its instances
+        return cls.define_personality()
+
+    @classmethod
     @abstractmethod
-    def define_personality(self) -> Dict[str, Any]:
+    def define_personality(cls) -> Dict[str, Any]:
         pass
 
     @abstractmethod
@@ -75,7 +268,8 @@ class BaseSellerAgent(ABC):
 
 class YourSellerAgent(BaseSellerAgent):
 
-    def define_personality(self) -> Dict[str, Any]:
+    @classmethod
+    def define_personality(cls) -> Dict[str, Any]:
         return {
             "personality_type": "firm but friendly",
             "traits": ["persuasive", "confident", "value-focused", "profit-minded"],
@@ -91,7 +285,33 @@ class YourSellerAgent(BaseSellerAgent):
         buyer_price: int,
         buyer_message: str
     ) -> Tuple[DealStatus, int, str]:
+        fair_price, last_offer = self._negotiation_bounds(context)
+        scripted = self._scripted_response(context, buyer_price, last_offer)
+        if scripted:
+            return scripted
+
+        messages = self._build_messages(context, buyer_price, buyer_message, fair_price, last_offer)
+        ai_reply = self.query_ollama(messages, fallback_price=last_offer)
+        return self._finalize_counter(context, ai_reply)
 
+    async def arespond_to_buyer_offer(
+        self,
+        context: NegotiationContext,
+        buyer_price: int,
+        buyer_message: str
+    ) -> Tuple[DealStatus, int, str]:
+        """Same decision as respond_to_buyer_offer, awaiting the LLM call."""
+        fair_price, last_offer = self._negotiation_bounds(context)
+        scripted = self._scripted_response(context, buyer_price, last_offer)
+        if scripted:
+            return scripted
+
+        messages = self._build_messages(context, buyer_price, buyer_message, fair_price, last_offer)
+        ai_reply = await self.aquery_ollama(messages, fallback_price=last_offer)
+        return self._finalize_counter(context, ai_reply)
+
+    @staticmethod
+    def _scripted_response(context: NegotiationContext, buyer_price: int, last_offer: int) -> Optional[Tuple[DealStatus, int, str]]:
         # ===== Special round-based behavior =====
         if context.current_round == 9:
             counter = int(buyer_price * 1.10)  # 10% increase from buyer's offer
@@ -100,15 +320,23 @@ class YourSellerAgent(BaseSellerAgent):
         if context.current_round == 10:
             return DealStatus.ACCEPTED, buyer_price, f"Alright, deal at ₹{buyer_price}!"
 
-        # ===== Normal behavior =====
-        fair_price = self.calculate_fair_price(context.product)
+        # Accept only if buyer meets or exceeds both market price and last offer
+        if buyer_price >= context.product.base_market_price and buyer_price >= last_offer:
+            return DealStatus.ACCEPTED, buyer_price, f"Deal at ₹{buyer_price}! You’re getting unmatched value."
+
+        return None
+
+    @classmethod
+    def _negotiation_bounds(cls, context: NegotiationContext) -> Tuple[int, int]:
+        fair_price = cls.calculate_fair_price(context.product)
         last_offer = context.seller_offers[-1] if context.seller_offers else fair_price + 50
+        return fair_price, last_offer
 
-        prompt = f"""
-You are the most talented seller, negotiating for {context.product.quantity} x {context.product.name} (quality: {context.product.quality_grade}).
+    @staticmethod
+    def _negotiation_brief(context: NegotiationContext, fair_price: int) -> str:
+        # Fixed for the whole negotiation, so it lives in the system message
+        return f"""You are negotiating for {context.product.quantity} x {context.product.name} (quality: {context.product.quality_grade}).
 Market price: ₹{context.product.base_market_price}, Fair price: ₹{fair_price}, Minimum acceptable price: ₹{context.seller_minimum_price}.
-Buyer offer: ₹{buyer_price} — "{buyer_message}".
-Your last offer: ₹{last_offer}.
 
 Rules:
 - Never sell at or below market price; always profit.
@@ -116,12 +344,40 @@ Rules:
 - Replies should be persuasive but short (max 2 sentences).
 """
 
-        ai_reply = self.query_ollama(prompt, fallback_price=last_offer)
-        counter = self.extract_price(ai_reply)
+    @staticmethod
+    def _turn_prompt(buyer_price: int, buyer_message: str, last_offer: int) -> str:
+        return f"""Buyer offer: ₹{buyer_price} — "{buyer_message}".
+Your last offer: ₹{last_offer}.
+"""
 
-        # Accept only if buyer meets or exceeds both market price and last offer
-        if buyer_price >= context.product.base_market_price and buyer_price >= last_offer:
-            return DealStatus.ACCEPTED, buyer_price, f"Deal at ₹{buyer_price}! You’re getting unmatched value."
+    def _build_messages(
+        self,
+        context: NegotiationContext,
+        buyer_price: int,
+        buyer_message: str,
+        fair_price: int,
+        last_offer: int
+    ) -> List[Dict[str, str]]:
+        """
+        Chat history for /api/chat. The system message and the turns before
+        the previous offer are identical from round to round, so the server
+        reuses their KV cache. The previous offer was sent as a turn prompt
+        but is replayed as the raw buyer message, so processing resumes there
+        and covers the last two turns.
+        """
+        system = f"{self.get_personality_prompt()}\n{self._negotiation_brief(context, fair_price)}"
+        messages = [{"role": "system", "content": system}]
+        roles, texts = context.message_roles, context.message_texts
+        if roles and roles[-1] == BUYER:
+            roles, texts = roles[:-1], texts[:-1]  # the offer being answered goes in the turn prompt
+        for role, text in zip(roles, texts):
+            messages.append({"role": _CHAT_ROLES[role], "content": text})
+        messages.append({"role": "user", "content": self._turn_prompt(buyer_price, buyer_message, last_offer)})
+        return messages
+
+    @classmethod
+    def _finalize_counter(cls, context: NegotiationContext, ai_reply: str) -> Tuple[DealStatus, int, str]:
+        counter = cls.extract_price(ai_reply)
 
         # Ensure counteroffer is strictly above market price
         min_price_allowed = context.product.base_market_price + 1
@@ -131,39 +387,88 @@ Rules:
 
         return DealStatus.ONGOING, counter, ai_reply
 
-    def query_ollama(self, prompt: str, fallback_price: int) -> str:
+    def query_ollama(self, messages: List[Dict[str, str]], fallback_price: int) -> str:
         try:
-            result = subprocess.run(
-                ["ollama", "run", OLLAMA_MODEL],
-                input=prompt.encode("utf-8"),
-                capture_output=True,
-                check=True
-            )
-            response = result.stdout.decode("utf-8").strip()
+            response = _cached_reply("/api/chat", _chat_payload(messages))
             return response if response else f"I can do ₹{fallback_price}."
         except Exception:
             return f"I can do ₹{fallback_price}."
 
-    def extract_price(self, text: str) -> int:
-        s = text.replace(",", "").replace("₹", "").strip()
-        match = re.search(r"(\d+(\.\d+)?)", s)
-        if not match:
-            return 0
-        return int(float(match.group(1)))
-
-    def calculate_fair_price(self, product: Product) -> int:
-        base = product.base_market_price
-        grade_adj = {"A": 1.05, "B": 0.95, "Export": 1.10}
-        multiplier = grade_adj.get(product.quality_grade, 1.0)
-        if product.attributes.get("export_grade"):
-            multiplier += 0.02
-        fair = int(base * multiplier)
-        # Always at least ₹1 above market price
-        return max(fair, base + 1)
+    async def aquery_ollama(self, messages: List[Dict[str, str]], fallback_price: int) -> str:
+        try:
+            response = await _acached_reply("/api/chat", _chat_payload(messages))
+            return response if response else f"I can do ₹{fallback_price}."
+        except Exception:
+            return f"I can do ₹{fallback_price}."
+
+    @staticmethod
+    def extract_price(text: str) -> int:
+        match = _PRICE_RE.search(text.translate(_STRIP_TBL))
+        return int(match.group()) if match else 0
+
+    @staticmethod
+    def calculate_fair_price(product: Product) -> int:
+        return _fair_price(product.base_market_price, product.quality_grade, bool(product.attributes.get("export_grade")))
 
     def get_personality_prompt(self) -> str:
         return "You are a persuasive seller who always sells above market price."
 
+# ============================================
+# OPENING OFFER
+# ============================================
+
+def open_negotiation(context: NegotiationContext) -> Tuple[int, str]:
+    # AI starts with an opening offer
+    opening_price = int(context.product.base_market_price * 1.15)  # 15% above market
+    opening_msg = f"These are premium {context.product.name}. I can offer them for ₹{opening_price}."
+    context.seller_offers.append(opening_price)
+    context.message_roles.append(SELLER)
+    context.message_texts.append(opening_msg)
+    return opening_price, opening_msg
+
+# ============================================
+# BATCH EVALUATION
+# ============================================
+
+# The agent keeps no per-negotiation state and the shared caches are locked,
+# so one instance serves every concurrent negotiation, tasks or threads
+_EVAL_AGENT = YourSellerAgent(name="EvalSeller")
+
+async def _negotiate(agent: YourSellerAgent, context: NegotiationContext, buyer_prices: List[int]) -> Tuple[DealStatus, int]:
+    if not context.seller_offers:
+        open_negotiation(context)
+
+    for buyer_price in buyer_prices:
+        buyer_message = f"I can pay ₹{buyer_price}."
+        context.current_round += 1
+        context.buyer_offers.append(buyer_price)
+        context.message_roles.append(BUYER)
+        context.message_texts.append(buyer_message)
+
+        status, ai_offer, ai_msg = await agent.arespond_to_buyer_offer(context, buyer_price, buyer_message)
+        context.seller_offers.append(ai_offer)
+        context.message_roles.append(SELLER)
+        context.message_texts.append(ai_msg)
+
+        if status == DealStatus.ACCEPTED:
+            return status, ai_offer
+    return DealStatus.REJECTED, context.seller_offers[-1]
+
+def run_many(scenarios: List[Tuple[NegotiationContext, List[int]]]) -> List[Tuple[DealStatus, int]]:
+    """
+    Play independent negotiations concurrently, one task per scenario.
+    Each scenario is a (context, scripted buyer prices) pair; returns the
+    final (status, price) of each. Start the server with OLLAMA_NUM_PARALLEL=N
+    so up to N requests are actually decoded in parallel.
+    """
+    async def _run():
+        try:
+            return await asyncio.gather(*(_negotiate(_EVAL_AGENT, context, prices) for context, prices in scenarios))
+        finally:
+            await _close_async_session()
+
+    return asyncio.run(_run())
+
 # ============================================
 # INTERACTIVE CHAT
 # ============================================
@@ -190,14 +495,11 @@ def chat_with_seller_llama():
         current_round=0,
         buyer_offers=[],
         seller_offers=[],
-        messages=[]
+        message_roles=[],
+        message_texts=[]
     )
 
-    # AI starts with an opening offer
-    opening_price = int(product.base_market_price * 1.15)  # 15% above market
-    opening_msg = f"These are premium {product.name}. I can offer them for ₹{opening_price}."
-    context.seller_offers.append(opening_price)
-    context.messages.append({"role": "seller", "message": opening_msg})
+    opening_price, opening_msg = open_negotiation(context)
     print(f"AI Seller: ₹{opening_price} — {opening_msg}")
 
     while True:
@@ -206,17 +508,20 @@ def chat_with_seller_llama():
             print("Exiting chat...")
             break
 
-        match = re.search(r"(\d+)", user_input.replace(",", ""))
-        buyer_price = int(match.group(1)) if match else 0
+        digits = user_input.translate(_STRIP_TBL)
+        match = _PRICE_RE.search(digits)
+        buyer_price = int(match.group()) if match else 0
         buyer_message = user_input
 
         context.current_round += 1
         context.buyer_offers.append(buyer_price)
-        context.messages.append({"role": "buyer", "message": buyer_message})
+        context.message_roles.append(BUYER)
+        context.message_texts.append(buyer_message)
 
         status, ai_offer, ai_msg = agent.respond_to_buyer_offer(context, buyer_price, buyer_message)
         context.seller_offers.append(ai_offer)
-        context.messages.append({"role": "seller", "message": ai_msg})
+        context.message_roles.append(SELLER)
+        context.message_texts.append(ai_msg)
 
         print(f"AI Seller: ₹{ai_offer} — {ai_msg}")
 